@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 import logging
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
@@ -13,9 +14,10 @@ from app.schemas import (
 from app.services.tasks_service import (
     create_task_service,
     get_task_service,
-    list_tasks_service
+    list_tasks_service,
+    stream_tasks_service,
 )
-from app.repository import SessionLocal
+from app.repository import AsyncReadSession
 
 logger = logging.getLogger(__name__)
 
@@ -23,21 +25,21 @@ router = APIRouter()
 
 
 @router.get("/db-health")
-def db_health():
+async def db_health():
     """Database health check endpoint."""
     try:
-        with SessionLocal() as session:
-            session.execute(text("SELECT 1"))
+        async with AsyncReadSession() as session:
+            await session.execute(text("SELECT 1"))
         logger.debug("Database health check passed")
         return {"db": "ok"}
     except SQLAlchemyError as e:
-        logger.error(f"Database health check failed: {e}", exc_info=True)
+        logger.error("Database health check failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Database connection failed"
         )
     except Exception as e:
-        logger.error(f"Unexpected error in database health check: {e}", exc_info=True)
+        logger.error("Unexpected error in database health check: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -45,15 +47,15 @@ def db_health():
 
 
 @router.post("/tasks", response_model=TaskCreateResponse, status_code=201)
-def create_task_api(payload: TaskCreateRequest):
+async def create_task_api(payload: TaskCreateRequest):
     """API endpoint to create a new task."""
-    logger.info(f"POST /tasks - Creating task: {payload.id}")
+    logger.info("POST /tasks - Creating task: %s", payload.id)
     try:
-        return create_task_service(payload)
+        return await create_task_service(payload)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in create_task_api: {e}", exc_info=True)
+        logger.error("Unexpected error in create_task_api: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -61,13 +63,13 @@ def create_task_api(payload: TaskCreateRequest):
 
 
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
-def get_task(task_id: str):
+async def get_task(task_id: str):
     """API endpoint to get a task by ID."""
-    logger.debug(f"GET /tasks/{task_id}")
+    logger.debug("GET /tasks/%s", task_id)
     try:
-        task = get_task_service(task_id)
+        task = await get_task_service(task_id)
         if not task:
-            logger.warning(f"Task {task_id} not found")
+            logger.warning("Task %s not found", task_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Task not found",
@@ -76,7 +78,7 @@ def get_task(task_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in get_task: {e}", exc_info=True)
+        logger.error("Unexpected error in get_task: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -84,15 +86,27 @@ def get_task(task_id: str):
 
 
 @router.get("/tasks", response_model=TaskListResponse)
-def get_all_tasks():
-    """API endpoint to list all tasks."""
-    logger.debug("GET /tasks - Listing all tasks")
+async def get_all_tasks(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    stream: bool = False,
+):
+    """
+    API endpoint to list tasks a page at a time.
+    With stream=true, every task is streamed as newline-delimited JSON instead.
+    """
+    logger.debug("GET /tasks - limit: %s, offset: %s, stream: %s", limit, offset, stream)
+    if stream:
+        return StreamingResponse(
+            stream_tasks_service(),
+            media_type="application/x-ndjson",
+        )
     try:
-        return list_tasks_service()
+        return await list_tasks_service(limit=limit, offset=offset)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in get_all_tasks: {e}", exc_info=True)
+        logger.error("Unexpected error in get_all_tasks: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
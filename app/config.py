@@ -7,6 +7,10 @@ DATABASE_URL = os.getenv(
     "sqlite:///./tasks.db"
 )
 
+DB_READ_POOL_SIZE = int(
+    os.getenv("DB_READ_POOL_SIZE", os.cpu_count() or 4)
+)
+
 MAX_CONCURRENT_TASKS = int(
     os.getenv("MAX_CONCURRENT_TASKS", 3)
 )
@@ -15,6 +19,16 @@ SCHEDULER_POLL_INTERVAL_MS = int(
     os.getenv("SCHEDULER_POLL_INTERVAL_MS", 500)
 )
 
+# How often the in-memory QUEUED counter is reconciled with the database
+QUEUED_AUDIT_INTERVAL_MS = int(
+    os.getenv("QUEUED_AUDIT_INTERVAL_MS", 60000)
+)
+
+# Max worker status updates committed per transaction
+COMPLETION_BATCH_SIZE = int(
+    os.getenv("COMPLETION_BATCH_SIZE", 32)
+)
+
 # Logging configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
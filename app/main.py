@@ -1,12 +1,13 @@
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from app.repository import engine, enable_wal
+from app.repository import write_engine, async_read_engine
 from app.models import metadata
 from app.api import router
-from app.repository import SessionLocal, reset_running_tasks
+from app.repository import WriteSession, reset_running_tasks
 import threading
-from app.scheduler import scheduler_loop
+from app.scheduler import scheduler_loop, notify_scheduler
+from app.worker import completion_committer_loop, run_task_loop
 import logging
 from app.config import setup_logging, MAX_CONCURRENT_TASKS
 
@@ -22,7 +23,8 @@ app.include_router(router)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled exceptions."""
     logger.error(
-        f"Unhandled exception: {exc}",
+        "Unhandled exception: %s",
+        exc,
         exc_info=True,
         extra={"path": request.url.path, "method": request.method}
     )
@@ -39,7 +41,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handler for request validation errors."""
     logger.warning(
-        f"Validation error: {exc.errors()}",
+        "Validation error: %s",
+        exc.errors(),
         extra={"path": request.url.path, "method": request.method}
     )
     return JSONResponse(
@@ -54,19 +57,38 @@ def on_startup():
     try:
         logger.info("Starting application...")
         
-        # Enable WAL mode for SQLite
-        enable_wal()
-        logger.info("WAL mode enabled for SQLite")
-        
         # Create database tables
-        metadata.create_all(bind=engine)
+        metadata.create_all(bind=write_engine)
+        # create_all skips indexes on tables that already exist
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=write_engine, checkfirst=True)
         logger.info("Database tables created/verified")
         
         # Reset any tasks that were running before crash
-        with SessionLocal() as session:
+        with WriteSession() as session:
             reset_running_tasks(session)
         logger.info("Reset any tasks in RUNNING state from previous session")
         
+        # Start completion committer thread; wakes the scheduler after each batch
+        committer_thread = threading.Thread(
+            target=completion_committer_loop,
+            args=(notify_scheduler,),
+            daemon=True,
+            name="CompletionCommitterThread"
+        )
+        committer_thread.start()
+        logger.info("Completion committer thread started")
+        
+        # Start task runner thread; executes claimed tasks on one event loop
+        task_runner_thread = threading.Thread(
+            target=run_task_loop,
+            daemon=True,
+            name="TaskRunnerThread"
+        )
+        task_runner_thread.start()
+        logger.info("Task runner thread started")
+        
         # Start scheduler thread
         scheduler_thread = threading.Thread(
             target=scheduler_loop,
@@ -74,14 +96,21 @@ def on_startup():
             name="SchedulerThread"
         )
         scheduler_thread.start()
-        logger.info(f"Scheduler thread started (max concurrent tasks: {MAX_CONCURRENT_TASKS})")
+        logger.info("Scheduler thread started (max concurrent tasks: %s)", MAX_CONCURRENT_TASKS)
         logger.info("Server started successfully")
         
     except Exception as e:
-        logger.critical(f"Failed to start application: {e}", exc_info=True)
+        logger.critical("Failed to start application: %s", e, exc_info=True)
         raise
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Close async database connections on application shutdown."""
+    await async_read_engine.dispose()
+    logger.info("Server shut down")
+
+
 @app.get("/health")
 def health_check():
     """Health check endpoint."""
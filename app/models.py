@@ -5,6 +5,7 @@ from sqlalchemy import (
     Integer,
     DateTime,
     ForeignKey,
+    Index,
     MetaData,
     func,
 )
@@ -50,3 +51,12 @@ task_dependencies = Table(
         primary_key=True,
     ),
 )
+
+# Scheduler filters on status and probes dependency status by id
+Index("ix_tasks_status_id", tasks.c.status, tasks.c.id)
+
+# Lookups by task_id are covered by the composite primary key
+Index("ix_task_dependencies_depends_on", task_dependencies.c.depends_on_task_id)
+
+# GET /tasks pages and streams in (created_at, id) order
+Index("ix_tasks_created_at_id", tasks.c.created_at, tasks.c.id)
@@ -1,49 +1,288 @@
 from sqlalchemy import (
+    and_,
+    bindparam,
     create_engine,
-    text,
+    event,
     select,
     update,
     insert,
-    exists
+    func,
 )
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, aliased
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+import functools
 import logging
+import random
+import time
 
-from app.config import DATABASE_URL
+from app.config import DATABASE_URL, DB_READ_POOL_SIZE
 from app.models import tasks, task_dependencies, TaskStatus
 
 logger = logging.getLogger(__name__)
 
 
-def enable_wal():
-    """Enable Write-Ahead Logging for SQLite."""
+# Applied to every new DBAPI connection; most SQLite PRAGMAs are per-connection
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "cache_size=-20000",
+    "temp_store=MEMORY",
+    "foreign_keys=ON",
+)
+
+
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    """Configure WAL and tuning PRAGMAs on each new connection."""
+    cursor = dbapi_conn.cursor()
     try:
-        with engine.connect() as conn:
-            conn.execute(text("PRAGMA journal_mode=WAL;"))
-            conn.commit()
-            logger.info("WAL mode enabled successfully")
-    except Exception as e:
-        logger.error(f"Failed to enable WAL mode: {e}", exc_info=True)
-        raise
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+    finally:
+        cursor.close()
+
+
+def _read_only_url(database_url: str):
+    """Build a read-only SQLite URI for the same database file."""
+    url = make_url(database_url)
+    return url.set(
+        database=f"file:{url.database}",
+        query={**url.query, "mode": "ro", "uri": "true"},
+    )
+
+
+def _async_url(url):
+    """Point a SQLite URL at the aiosqlite driver."""
+    return make_url(url).set(drivername="sqlite+aiosqlite")
+
+
+def _disable_driver_transactions(dbapi_conn, _connection_record):
+    """Let SQLAlchemy emit BEGIN itself instead of the sqlite3 driver."""
+    dbapi_conn.isolation_level = None
+
+
+def _begin_immediate(conn):
+    """Take the write lock upfront rather than upgrading mid-transaction."""
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _configure_sqlite_engine(sync_engine, writer: bool = False):
+    """Attach the shared SQLite connection hooks to an engine."""
+    event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    if writer:
+        event.listen(sync_engine, "connect", _disable_driver_transactions)
+        event.listen(sync_engine, "begin", _begin_immediate)
 
-# SQLite-specific settings
-engine = create_engine(
+
+def _create_sqlite_engine(url, writer: bool = False, **kwargs):
+    """Create a sync engine for the scheduler and worker threads."""
+    sqlite_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},  # Needed for threading
+        poolclass=QueuePool,
+        future=True,
+        **kwargs,
+    )
+    _configure_sqlite_engine(sqlite_engine, writer=writer)
+    return sqlite_engine
+
+
+def _create_async_sqlite_engine(url, **kwargs):
+    """Create a read-only aiosqlite engine for the API request handlers."""
+    sqlite_engine = create_async_engine(
+        _async_url(url),
+        connect_args={"check_same_thread": False},
+        **kwargs,
+    )
+    _configure_sqlite_engine(sqlite_engine.sync_engine)
+    return sqlite_engine
+
+
+# Single writer connection shared by the API, scheduler and committer:
+# SQLite allows one writer at a time anyway, so queueing on the pool is
+# cheaper than contending for the file lock.
+write_engine = _create_sqlite_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for threading
+    writer=True,
+    pool_size=1,
+    max_overflow=0,
+)
+
+# Read-only connections proceed in parallel on WAL snapshots.
+read_engine = _create_sqlite_engine(
+    _read_only_url(DATABASE_URL),
+    pool_size=DB_READ_POOL_SIZE,
+)
+
+async_read_engine = _create_async_sqlite_engine(
+    _read_only_url(DATABASE_URL),
+    pool_size=DB_READ_POOL_SIZE,
+)
+
+
+WriteSession = sessionmaker(
+    bind=write_engine,
+    autocommit=False,
+    autoflush=False,
     future=True,
 )
 
-SessionLocal = sessionmaker(
-    bind=engine,
+ReadSession = sessionmaker(
+    bind=read_engine,
     autocommit=False,
     autoflush=False,
     future=True,
 )
 
+AsyncReadSession = async_sessionmaker(
+    bind=async_read_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Retry policy for writes that still hit "database is locked" after busy_timeout
+BUSY_RETRY_ATTEMPTS = 5
+BUSY_RETRY_BASE_DELAY_S = 0.001
+BUSY_RETRY_MAX_DELAY_S = 0.05
+
+
+def _is_busy_error(error: OperationalError) -> bool:
+    """True for SQLITE_BUSY / SQLITE_LOCKED errors."""
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def _is_busy(error: SQLAlchemyError) -> bool:
+    """True if `error` is a busy error that retry_on_busy will handle."""
+    return isinstance(error, OperationalError) and _is_busy_error(error)
+
+
+def _busy_backoff(attempt: int) -> float:
+    """Exponential backoff with jitter, capped at BUSY_RETRY_MAX_DELAY_S."""
+    delay = min(BUSY_RETRY_MAX_DELAY_S, BUSY_RETRY_BASE_DELAY_S * (2 ** attempt))
+    return delay + random.uniform(0, BUSY_RETRY_BASE_DELAY_S)
+
+
+def retry_on_busy(fn):
+    """
+    Retry a write on SQLITE_BUSY with exponential backoff.
+    Wrapped functions roll back on failure, so their session is reusable,
+    and leave busy errors to be logged here once retries run out.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(BUSY_RETRY_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                if not _is_busy_error(e):
+                    raise
+                if attempt == BUSY_RETRY_ATTEMPTS - 1:
+                    logger.error(
+                        "%s failed after %s attempts on a locked database: %s",
+                        fn.__name__,
+                        BUSY_RETRY_ATTEMPTS,
+                        e,
+                        exc_info=True,
+                    )
+                    raise
+                delay = _busy_backoff(attempt)
+                logger.warning("%s hit a locked database, retrying in %.1fms", fn.__name__, delay * 1000)
+                time.sleep(delay)
+    return wrapper
+
+
+def _runnable_task_ids(candidate, limit):
+    """
+    Select IDs of QUEUED tasks whose dependencies are all COMPLETED.
+    `candidate` is an alias of the tasks table, so the query can sit
+    inside an UPDATE of tasks without correlating to it.
+
+    Anti-join form: only unfinished dependencies match the second outer
+    join, so a task is runnable when none of them did.
+    """
+    dep_task = aliased(tasks)
+
+    return (
+        select(candidate.c.id)
+        .select_from(
+            candidate
+            .outerjoin(
+                task_dependencies,
+                task_dependencies.c.task_id == candidate.c.id,
+            )
+            .outerjoin(
+                dep_task,
+                and_(
+                    dep_task.c.id == task_dependencies.c.depends_on_task_id,
+                    dep_task.c.status != TaskStatus.COMPLETED,
+                ),
+            )
+        )
+        .where(candidate.c.status == TaskStatus.QUEUED)
+        .group_by(candidate.c.id)
+        .having(func.count(dep_task.c.id) == 0)
+        .limit(limit)
+    )
 
 
+# Statements are built once at import and reused with bound parameters,
+# so hot paths skip construction and cache-key generation on every call.
+_INSERT_TASK = insert(tasks)
 
+_INSERT_TASK_DEPENDENCIES = insert(task_dependencies)
+
+_GET_TASK = select(tasks).where(tasks.c.id == bindparam("task_id"))
+
+_EXISTING_TASK_IDS = select(tasks.c.id).where(
+    tasks.c.id.in_(bindparam("task_ids", expanding=True))
+)
+
+# Rows fetched per round trip when streaming the full task table
+TASK_STREAM_BATCH_SIZE = 500
+
+_ALL_TASKS_ORDERED = select(tasks).order_by(tasks.c.created_at, tasks.c.id)
+
+_LIST_TASKS = (
+    _ALL_TASKS_ORDERED
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
+_STREAM_TASKS = _ALL_TASKS_ORDERED.execution_options(
+    yield_per=TASK_STREAM_BATCH_SIZE
+)
+
+_COUNT_QUEUED_TASKS = (
+    select(func.count())
+    .select_from(tasks)
+    .where(tasks.c.status == TaskStatus.QUEUED)
+)
+
+# Alias the candidate so the subquery doesn't correlate to the UPDATE target
+_claim_candidate = aliased(tasks)
+_CLAIM_RUNNABLE_TASKS = (
+    update(tasks)
+    .where(
+        tasks.c.id.in_(_runnable_task_ids(_claim_candidate, bindparam("limit"))),
+        tasks.c.status == TaskStatus.QUEUED,
+    )
+    .values(status=TaskStatus.RUNNING)
+    .returning(tasks.c.id, tasks.c.duration_ms)
+)
+
+_SET_TASKS_STATUS = (
+    update(tasks)
+    .where(tasks.c.id.in_(bindparam("task_ids", expanding=True)))
+    .values(status=bindparam("new_status"))
+)
+
+
+@retry_on_busy
 def create_task(
     session,
     task_id: str,
@@ -56,145 +295,121 @@ def create_task(
     """
     try:
         session.execute(
-            insert(tasks).values(
-                id=task_id,
-                type=task_type,
-                duration_ms=duration_ms,
-                status=TaskStatus.QUEUED,
-            )
+            _INSERT_TASK,
+            {
+                "id": task_id,
+                "type": task_type,
+                "duration_ms": duration_ms,
+                "status": TaskStatus.QUEUED,
+            },
         )
 
-        for dep_id in dependencies:
+        if dependencies:
             session.execute(
-                insert(task_dependencies).values(
-                    task_id=task_id,
-                    depends_on_task_id=dep_id,
-                )
+                _INSERT_TASK_DEPENDENCIES,
+                [
+                    {"task_id": task_id, "depends_on_task_id": dep_id}
+                    for dep_id in dependencies
+                ],
             )
 
         session.commit()
-        logger.debug(f"Task {task_id} created successfully with {len(dependencies)} dependencies")
+        logger.debug("Task %s created successfully with %s dependencies", task_id, len(dependencies))
     except IntegrityError as e:
         session.rollback()
-        logger.warning(f"Integrity error creating task {task_id}: {e}")
+        logger.warning("Integrity error creating task %s: %s", task_id, e)
         raise
     except SQLAlchemyError as e:
         session.rollback()
-        logger.error(f"Database error creating task {task_id}: {e}", exc_info=True)
+        if not _is_busy(e):
+            logger.error("Database error creating task %s: %s", task_id, e, exc_info=True)
         raise
 
 
-def get_task_by_id(session, task_id: str):
-    stmt = select(tasks).where(tasks.c.id == task_id)
-    result = session.execute(stmt).first()
+async def get_task_by_id(session, task_id: str):
+    result = (await session.execute(_GET_TASK, {"task_id": task_id})).first()
     return result
 
 
-def list_tasks(session):
-    stmt = select(tasks)
-    result = session.execute(stmt).all()
-    return result
-
+async def find_existing_task_ids(session, task_ids: list[str]) -> set[str]:
+    """Return the subset of task_ids that exist, in a single query."""
+    if not task_ids:
+        return set()
+    result = await session.execute(_EXISTING_TASK_IDS, {"task_ids": task_ids})
+    return set(result.scalars())
 
-def find_runnable_tasks(session, limit: int):
-    """Find tasks that are ready to run (QUEUED with all dependencies completed)."""
-    try:
-        dep_task = aliased(tasks)
 
-        subquery = (
-            select(1)
-            .select_from(task_dependencies)
-            .join(
-                dep_task,
-                task_dependencies.c.depends_on_task_id == dep_task.c.id,
-            )
-            .where(task_dependencies.c.task_id == tasks.c.id)
-            .where(dep_task.c.status != TaskStatus.COMPLETED)
-        )
+async def list_tasks(session, limit: int, offset: int):
+    params = {"limit": limit, "offset": offset}
+    result = (await session.execute(_LIST_TASKS, params)).all()
+    return result
 
-        stmt = (
-            select(tasks.c.id)
-            .where(
-                tasks.c.status == TaskStatus.QUEUED,
-                ~exists(subquery),
-            )
-            .limit(limit)
-        )
 
-        return session.execute(stmt).scalars().all()
-    except SQLAlchemyError as e:
-        logger.error(f"Database error finding runnable tasks: {e}", exc_info=True)
-        raise
+async def stream_tasks(session):
+    """Iterate over every task in batches, without loading the table into memory."""
+    return await session.stream(_STREAM_TASKS)
 
 
-def mark_task_running(session, task_id: str) -> bool:
-    """
-    Attempt to mark task as RUNNING.
-    Returns True if successful, False if task was already taken.
-    """
+def count_queued_tasks(session) -> int:
+    """Count tasks in QUEUED state."""
     try:
-        stmt = (
-            update(tasks)
-            .where(
-                tasks.c.id == task_id,
-                tasks.c.status == TaskStatus.QUEUED,
-            )
-            .values(status=TaskStatus.RUNNING)
-        )
-
-        result = session.execute(stmt)
-        if result.rowcount == 0:
-            session.rollback()
-            return False
-
-        session.commit()
-        return True
+        return session.execute(_COUNT_QUEUED_TASKS).scalar_one()
     except SQLAlchemyError as e:
-        session.rollback()
-        logger.error(f"Database error marking task {task_id} as running: {e}", exc_info=True)
+        logger.error("Database error counting queued tasks: %s", e, exc_info=True)
         raise
 
 
-def mark_task_completed(session, task_id: str):
-    """Mark a task as completed."""
+@retry_on_busy
+def claim_runnable_tasks(session, limit: int):
+    """
+    Atomically find up to `limit` runnable tasks and mark them RUNNING.
+    Returns (id, duration_ms) rows for the claimed tasks.
+    """
     try:
-        result = session.execute(
-            update(tasks)
-            .where(tasks.c.id == task_id)
-            .values(status=TaskStatus.COMPLETED)
-        )
+        claimed = session.execute(_CLAIM_RUNNABLE_TASKS, {"limit": limit}).all()
         session.commit()
-        
-        if result.rowcount == 0:
-            logger.warning(f"Task {task_id} not found when marking as completed")
-        else:
-            logger.debug(f"Task {task_id} marked as COMPLETED")
+        return claimed
     except SQLAlchemyError as e:
         session.rollback()
-        logger.error(f"Database error marking task {task_id} as completed: {e}", exc_info=True)
+        if not _is_busy(e):
+            logger.error("Database error claiming runnable tasks: %s", e, exc_info=True)
         raise
 
 
-def mark_task_failed(session, task_id: str):
-    """Mark a task as failed."""
+@retry_on_busy
+def mark_tasks_finished(
+    session,
+    completed_ids: list[str],
+    failed_ids: list[str],
+):
+    """Mark a batch of tasks as COMPLETED or FAILED in a single transaction."""
     try:
-        result = session.execute(
-            update(tasks)
-            .where(tasks.c.id == task_id)
-            .values(status=TaskStatus.FAILED)
-        )
+        for task_ids, new_status in (
+            (completed_ids, TaskStatus.COMPLETED),
+            (failed_ids, TaskStatus.FAILED),
+        ):
+            if not task_ids:
+                continue
+            result = session.execute(
+                _SET_TASKS_STATUS,
+                {"task_ids": task_ids, "new_status": new_status},
+            )
+            if result.rowcount < len(task_ids):
+                logger.warning(
+                    "%s task(s) not found when marking as %s",
+                    len(task_ids) - result.rowcount,
+                    new_status,
+                )
         session.commit()
-        
-        if result.rowcount == 0:
-            logger.warning(f"Task {task_id} not found when marking as failed")
-        else:
-            logger.debug(f"Task {task_id} marked as FAILED")
+        logger.debug("Marked %s task(s) COMPLETED and %s FAILED", len(completed_ids), len(failed_ids))
     except SQLAlchemyError as e:
         session.rollback()
-        logger.error(f"Database error marking task {task_id} as failed: {e}", exc_info=True)
+        if not _is_busy(e):
+            logger.error("Database error marking tasks as finished: %s", e, exc_info=True)
         raise
 
 
+@retry_on_busy
 def reset_running_tasks(session):
     """Reset tasks in RUNNING state to QUEUED (for crash recovery)."""
     try:
@@ -207,28 +422,11 @@ def reset_running_tasks(session):
         
         count = result.rowcount
         if count > 0:
-            logger.info(f"Reset {count} task(s) from RUNNING to QUEUED state")
+            logger.info("Reset %s task(s) from RUNNING to QUEUED state", count)
         else:
             logger.debug("No tasks in RUNNING state to reset")
     except SQLAlchemyError as e:
         session.rollback()
-        logger.error(f"Database error resetting running tasks: {e}", exc_info=True)
+        if not _is_busy(e):
+            logger.error("Database error resetting running tasks: %s", e, exc_info=True)
         raise
-
-def load_dependency_graph(session) -> dict[str, list[str]]:
-    """
-    Returns adjacency list: task -> [dependencies]
-    """
-    graph: dict[str, list[str]] = {}
-
-    rows = session.execute(
-        select(
-            task_dependencies.c.task_id,
-            task_dependencies.c.depends_on_task_id,
-        )
-    ).all()
-
-    for task_id, dep_id in rows:
-        graph.setdefault(task_id, []).append(dep_id)
-
-    return graph
@@ -1,89 +1,188 @@
-from concurrent.futures import ThreadPoolExecutor
-from app.config import MAX_CONCURRENT_TASKS, SCHEDULER_POLL_INTERVAL_MS
+import asyncio
+from app.config import (
+    MAX_CONCURRENT_TASKS,
+    QUEUED_AUDIT_INTERVAL_MS,
+    SCHEDULER_POLL_INTERVAL_MS,
+)
+import threading
 import time
 import logging
 from app.repository import (
-    SessionLocal,
-    find_runnable_tasks,
-    mark_task_running,
-    get_task_by_id,
+    ReadSession,
+    WriteSession,
+    claim_runnable_tasks,
+    count_queued_tasks,
 )
-from app.worker import execute_task
+from app.worker import execute_task, task_loop
 
 logger = logging.getLogger(__name__)
 
-executor = ThreadPoolExecutor(
-    max_workers=MAX_CONCURRENT_TASKS
-)
+# One permit per running task; held from submit until the task's future is done
+worker_slots = threading.BoundedSemaphore(MAX_CONCURRENT_TASKS)
+
+# Wakes the scheduler when a task is created or a worker finishes.
+# Also guards the QUEUED counter below.
+scheduler_cv = threading.Condition()
+_wakeup_pending = False
+
+# Tasks believed to be QUEUED; lets an idle scheduler skip the database.
+# Only undercounts between a create's commit and its notify_task_queued(),
+# and is reconciled against the database every QUEUED_AUDIT_INTERVAL_MS.
+_queued_count = 0
+
+# Creates notified since the current audit started its COUNT(*)
+_queued_since_audit = 0
+
+
+def notify_scheduler():
+    """Wake the scheduler loop so it re-checks for runnable tasks."""
+    global _wakeup_pending
+    with scheduler_cv:
+        _wakeup_pending = True
+        scheduler_cv.notify()
+
+
+def notify_task_queued():
+    """Record a newly committed QUEUED task and wake the scheduler."""
+    global _queued_count, _queued_since_audit, _wakeup_pending
+    with scheduler_cv:
+        _queued_count += 1
+        _queued_since_audit += 1
+        _wakeup_pending = True
+        scheduler_cv.notify()
+
+
+def _audit_queued_count():
+    """
+    Reset the QUEUED counter from the database.
+    The query runs without the lock so event-loop callers never wait on it.
+    Creates notified meanwhile are added back on top of the count, so a
+    concurrent create can only be counted twice, never missed.
+    """
+    global _queued_count, _queued_since_audit
+    with scheduler_cv:
+        _queued_since_audit = 0
+
+    with ReadSession() as read_session:
+        queued = count_queued_tasks(read_session)
+
+    with scheduler_cv:
+        queued += _queued_since_audit
+        if queued != _queued_count:
+            logger.debug("QUEUED counter corrected from %s to %s", _queued_count, queued)
+        _queued_count = queued
+
+
+def _reserve_slots() -> int:
+    """Take every free worker slot without blocking; returns how many."""
+    reserved = 0
+    while reserved < MAX_CONCURRENT_TASKS and worker_slots.acquire(blocking=False):
+        reserved += 1
+    return reserved
+
+
+def _release_slots(count: int):
+    """Return unused worker slots."""
+    for _ in range(count):
+        worker_slots.release()
+
+
+def _on_task_done(_future):
+    """Release the worker slot and wake the scheduler."""
+    worker_slots.release()
+    notify_scheduler()
+
+
+def _wait_for_wakeup():
+    """Block until notified, or until the poll interval elapses as a safety net."""
+    global _wakeup_pending
+    with scheduler_cv:
+        scheduler_cv.wait_for(
+            lambda: _wakeup_pending,
+            timeout=SCHEDULER_POLL_INTERVAL_MS / 1000,
+        )
+        _wakeup_pending = False
+
 
 def scheduler_loop():
     """
-    Continuously polls for runnable tasks and dispatches them.
+    Dispatches runnable tasks, sleeping until notified of new work.
     """
-    logger.info(f"Scheduler loop started (max workers: {MAX_CONCURRENT_TASKS})")
+    logger.info("Scheduler loop started (max workers: %s)", MAX_CONCURRENT_TASKS)
+
+    global _queued_count
+
+    # Reused across iterations; the connection goes back to the pool after each commit
+    session = WriteSession()
+    next_audit = 0.0
     
     while True:
         try:
-            with SessionLocal() as session:
-                # Determine available worker slots
-                queue_size = executor._work_queue.qsize()
-                available_slots = MAX_CONCURRENT_TASKS - queue_size
+            if time.monotonic() >= next_audit:
+                _audit_queued_count()
+                next_audit = time.monotonic() + QUEUED_AUDIT_INTERVAL_MS / 1000
+
+            # Nothing queued: skip the database entirely
+            with scheduler_cv:
+                queued = _queued_count
+            if queued <= 0:
+                _wait_for_wakeup()
+                continue
+
+            # Reserve free worker slots; each claimed task keeps one
+            available_slots = _reserve_slots()
 
-                if available_slots <= 0:
-                    logger.debug(f"No available worker slots (queue size: {queue_size})")
-                    time.sleep(SCHEDULER_POLL_INTERVAL_MS / 1000)
-                    continue
+            if available_slots == 0:
+                logger.debug("No available worker slots")
+                _wait_for_wakeup()
+                continue
 
-                # Find runnable tasks
+            # Claim runnable tasks in a single UPDATE ... RETURNING
+            try:
+                claimed_tasks = claim_runnable_tasks(
+                    session,
+                    limit=available_slots,
+                )
+            except Exception as e:
+                _release_slots(available_slots)
+                logger.error("Error claiming runnable tasks: %s", e, exc_info=True)
+                _wait_for_wakeup()
+                continue
+
+            _release_slots(available_slots - len(claimed_tasks))
+            with scheduler_cv:
+                _queued_count -= len(claimed_tasks)
+            
+            # Building the ID list is only worth it when the record is emitted
+            if claimed_tasks and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Claimed %s runnable task(s): %s", len(claimed_tasks), [t.id for t in claimed_tasks])
+
+            for task_id, duration_ms in claimed_tasks:
                 try:
-                    runnable_tasks = find_runnable_tasks(
-                        session,
-                        limit=available_slots,
+                    # Submit to the task runner loop
+                    future = asyncio.run_coroutine_threadsafe(
+                        execute_task(task_id, duration_ms),
+                        task_loop,
                     )
+                    future.add_done_callback(_on_task_done)
+                    logger.info("Task %s submitted to task runner (duration: %sms)", task_id, duration_ms)
+                    
                 except Exception as e:
-                    logger.error(f"Error finding runnable tasks: {e}", exc_info=True)
-                    time.sleep(SCHEDULER_POLL_INTERVAL_MS / 1000)
-                    continue
-                
-                if runnable_tasks:
-                    logger.debug(f"Found {len(runnable_tasks)} runnable task(s): {runnable_tasks}")
-
-                for task_id in runnable_tasks:
-                    try:
-                        # Attempt to lock task
-                        locked = mark_task_running(session, task_id)
-                        if not locked:
-                            logger.debug(f"Task {task_id} was already claimed by another worker")
-                            continue
-
-                        # Fetch task details
-                        row = get_task_by_id(session, task_id)
-                        if not row:
-                            logger.warning(f"Task {task_id} not found after marking as running")
-                            continue
-                            
-                        task = row._mapping
-
-                        # Submit to worker pool
-                        executor.submit(
-                            execute_task,
-                            task_id,
-                            task["duration_ms"],
-                        )
-                        logger.info(f"Task {task_id} submitted to worker pool (duration: {task['duration_ms']}ms)")
-                        
-                    except Exception as e:
-                        logger.error(
-                            f"Error processing task {task_id}: {e}",
-                            exc_info=True,
-                            extra={"task_id": task_id}
-                        )
+                    worker_slots.release()
+                    logger.error(
+                        "Error processing task %s: %s",
+                        task_id,
+                        e,
+                        exc_info=True,
+                        extra={"task_id": task_id}
+                    )
 
         except Exception as e:
+            session.rollback()
             logger.error(
-                f"Error in scheduler loop: {e}",
+                "Error in scheduler loop: %s",
+                e,
                 exc_info=True
             )
 
-        time.sleep(SCHEDULER_POLL_INTERVAL_MS / 1000)
-
+        _wait_for_wakeup()
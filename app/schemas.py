@@ -1,9 +1,9 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from typing import List
 
 class TaskCreateRequest(BaseModel):
-    id: str = Field(..., example="task-A")
-    type: str = Field(..., example="data_processing")
+    id: str = Field(..., examples=["task-A"])
+    type: str = Field(..., examples=["data_processing"])
     duration_ms: int = Field(..., gt=0)
     dependencies: List[str] = Field(default_factory=list)
 
@@ -13,10 +13,16 @@ class TaskCreateResponse(BaseModel):
     status: str
     
 class TaskResponse(BaseModel):
+    # Validate straight from SQLAlchemy rows
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     type: str
     duration_ms: int
     status: str
 
 class TaskListResponse(BaseModel):
-    tasks: List[TaskResponse]
\ No newline at end of file
+    tasks: List[TaskResponse]
+
+# Validates a whole result set in one call instead of one model per row
+TASK_LIST_ADAPTER = TypeAdapter(List[TaskResponse])
\ No newline at end of file
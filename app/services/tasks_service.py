@@ -1,165 +1,169 @@
+import asyncio
 import traceback
 import logging
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from fastapi import HTTPException, status
 
-from app.repository import SessionLocal
+from app.repository import AsyncReadSession, WriteSession
 from app.schemas import (
     TaskCreateRequest,
     TaskCreateResponse,
     TaskResponse,
     TaskListResponse,
+    TASK_LIST_ADAPTER,
 )
 from app.models import TaskStatus
 from app.repository import (
     get_task_by_id,
+    find_existing_task_ids,
     create_task,
     list_tasks,
-    load_dependency_graph,
+    stream_tasks,
 )
-from app.dag import has_cycle
+from app.scheduler import notify_task_queued
 
 logger = logging.getLogger(__name__)
 
 
-def create_task_service(payload: TaskCreateRequest) -> TaskCreateResponse:
+def _insert_task(payload: TaskCreateRequest):
+    """Insert through the shared single-connection writer pool."""
+    with WriteSession() as session:
+        create_task(
+            session=session,
+            task_id=payload.id,
+            task_type=payload.type,
+            duration_ms=payload.duration_ms,
+            dependencies=payload.dependencies,
+        )
+
+
+async def create_task_service(payload: TaskCreateRequest) -> TaskCreateResponse:
     """Service function to create a new task."""
-    logger.info(f"Creating task: {payload.id} (type: {payload.type}, dependencies: {payload.dependencies})")
+    logger.info("Creating task: %s (type: %s, dependencies: %s)", payload.id, payload.type, payload.dependencies)
     
-    with SessionLocal() as session:
-        try:
-            # Check if task already exists
-            if get_task_by_id(session, payload.id):
-                logger.warning(f"Task creation failed: task {payload.id} already exists")
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Task with this ID already exists",
-                )
+    try:
+        # Existing tasks form a DAG and a new task has no dependents yet,
+        # so the only cycle it can introduce is a self-dependency.
+        if payload.id in payload.dependencies:
+            logger.warning("Task creation failed: task %s depends on itself", payload.id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Task dependency cycle detected",
+            )
 
-            # Validate all dependencies exist
-            for dep_id in payload.dependencies:
-                if not get_task_by_id(session, dep_id):
-                    logger.warning(f"Task creation failed: dependency '{dep_id}' does not exist")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Dependency task '{dep_id}' does not exist",
-                    )
-
-            # Check for cycles in dependency graph
-            graph = load_dependency_graph(session)
-            graph[payload.id] = payload.dependencies
-
-            if has_cycle(graph):
-                logger.warning(f"Task creation failed: dependency cycle detected for task {payload.id}")
+        # Validate all dependencies exist; the read connection is released
+        # before the insert so it isn't held while waiting for the writer.
+        async with AsyncReadSession() as session:
+            existing = await find_existing_task_ids(session, payload.dependencies)
+        for dep_id in payload.dependencies:
+            if dep_id not in existing:
+                logger.warning("Task creation failed: dependency '%s' does not exist", dep_id)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Task dependency cycle detected",
+                    detail=f"Dependency task '{dep_id}' does not exist",
                 )
 
-            # Create the task
-            create_task(
-                session=session,
-                task_id=payload.id,
-                task_type=payload.type,
-                duration_ms=payload.duration_ms,
-                dependencies=payload.dependencies,
-            )
+        # Create the task; a duplicate ID surfaces as IntegrityError -> 409.
+        # Runs in a thread so waiting for the writer doesn't block the event loop.
+        await asyncio.to_thread(_insert_task, payload)
+        notify_task_queued()
 
-            logger.info(f"Task {payload.id} created successfully")
-            return TaskCreateResponse(
-                id=payload.id,
-                status=TaskStatus.QUEUED,
-            )
+        logger.info("Task %s created successfully", payload.id)
+        return TaskCreateResponse(
+            id=payload.id,
+            status=TaskStatus.QUEUED,
+        )
 
-        except IntegrityError as e:
-            logger.error(f"Integrity error creating task {payload.id}: {e}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Task or dependency already exists",
-            )
+    except IntegrityError as e:
+        # Expected path for duplicate IDs, so no traceback
+        logger.warning("Task creation failed: task %s conflicts with existing data: %s", payload.id, e)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Task or dependency already exists",
+        )
 
-        except HTTPException:
-            raise
+    except HTTPException:
+        raise
 
-        except SQLAlchemyError as e:
-            logger.error(f"Database error creating task {payload.id}: {e}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Database error while creating task",
-            )
+    except SQLAlchemyError as e:
+        logger.error("Database error creating task %s: %s", payload.id, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error while creating task",
+        )
 
-        except Exception as e:
-            logger.error(f"Unexpected error creating task {payload.id}: {e}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Internal server error while creating task",
-            )
+    except Exception as e:
+        logger.error("Unexpected error creating task %s: %s", payload.id, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error while creating task",
+        )
 
 
-def get_task_service(task_id: str) -> TaskResponse | None:
+async def get_task_service(task_id: str) -> TaskResponse | None:
     """Service function to get a task by ID."""
-    logger.debug(f"Fetching task: {task_id}")
+    logger.debug("Fetching task: %s", task_id)
     
     try:
-        with SessionLocal() as session:
-            row = get_task_by_id(session, task_id)
+        async with AsyncReadSession() as session:
+            row = await get_task_by_id(session, task_id)
             if not row:
-                logger.debug(f"Task {task_id} not found")
+                logger.debug("Task %s not found", task_id)
                 return None
 
-            task = row._mapping
-
-            return TaskResponse(
-                id=task["id"],
-                type=task["type"],
-                duration_ms=task["duration_ms"],
-                status=task["status"],
-            )
+            return TaskResponse.model_validate(row)
     except SQLAlchemyError as e:
-        logger.error(f"Database error fetching task {task_id}: {e}", exc_info=True)
+        logger.error("Database error fetching task %s: %s", task_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error while fetching task",
         )
     except Exception as e:
-        logger.error(f"Unexpected error fetching task {task_id}: {e}", exc_info=True)
+        logger.error("Unexpected error fetching task %s: %s", task_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error while fetching task",
         )
 
 
-def list_tasks_service() -> TaskListResponse:
-    """Service function to list all tasks."""
-    logger.debug("Fetching all tasks")
+async def list_tasks_service(limit: int = 100, offset: int = 0) -> TaskListResponse:
+    """Service function to list a page of tasks."""
+    logger.debug("Fetching tasks (limit: %s, offset: %s)", limit, offset)
     
     try:
-        with SessionLocal() as session:
-            rows = list_tasks(session)
-
-            tasks = []
-            for row in rows:
-                task = row._mapping
-                tasks.append(
-                    TaskResponse(
-                        id=task["id"],
-                        type=task["type"],
-                        duration_ms=task["duration_ms"],
-                        status=task["status"],
-                    )
-                )
+        async with AsyncReadSession() as session:
+            rows = await list_tasks(session, limit=limit, offset=offset)
 
-            logger.debug(f"Found {len(tasks)} task(s)")
+            tasks = TASK_LIST_ADAPTER.validate_python(rows)
+
+            logger.debug("Found %s task(s)", len(tasks))
             return TaskListResponse(tasks=tasks)
     except SQLAlchemyError as e:
-        logger.error(f"Database error listing tasks: {e}", exc_info=True)
+        logger.error("Database error listing tasks: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error while listing tasks",
         )
     except Exception as e:
-        logger.error(f"Unexpected error listing tasks: {e}", exc_info=True)
+        logger.error("Unexpected error listing tasks: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error while listing tasks",
         )
+
+
+async def stream_tasks_service():
+    """
+    Service function yielding every task as a line of JSON.
+    The response has already started, so errors are logged, not raised as HTTP errors.
+    """
+    logger.debug("Streaming all tasks")
+
+    try:
+        async with AsyncReadSession() as session:
+            result = await stream_tasks(session)
+            async for row in result:
+                yield TaskResponse.model_validate(row).model_dump_json() + "\n"
+    except Exception as e:
+        logger.error("Error streaming tasks: %s", e, exc_info=True)
+        raise
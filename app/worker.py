@@ -1,54 +1,115 @@
+import asyncio
+import queue
 import time
 import logging
+from app.config import COMPLETION_BATCH_SIZE
+from app.models import TaskStatus
 from app.repository import (
-    SessionLocal,
-    mark_task_completed,
-    mark_task_failed,
+    WriteSession,
+    mark_tasks_finished,
 )
 
 logger = logging.getLogger(__name__)
 
-def execute_task(task_id: str, duration_ms: int):
+# (task_id, status) pairs waiting to be persisted by the committer thread
+completion_queue: queue.Queue[tuple[str, str]] = queue.Queue()
+
+# Backoff before retrying a batch the committer failed to persist
+COMMIT_RETRY_BASE_DELAY_S = 0.1
+COMMIT_RETRY_MAX_DELAY_S = 5.0
+
+# Simulated tasks only await timers, so a single event loop runs all of them
+task_loop = asyncio.new_event_loop()
+
+
+def run_task_loop():
+    """
+    Runs the task event loop forever.
+    Runs in a dedicated thread; tasks are submitted with run_coroutine_threadsafe.
+    """
+    asyncio.set_event_loop(task_loop)
+    logger.info("Task runner event loop started")
+    task_loop.run_forever()
+
+
+async def execute_task(task_id: str, duration_ms: int):
     """
     Simulates task execution.
-    Runs inside a worker thread.
+    Runs on the task runner event loop.
     """
-    logger.info(f"Starting execution of task {task_id} (duration: {duration_ms}ms)")
+    logger.info("Starting execution of task %s (duration: %sms)", task_id, duration_ms)
     
     try:
         # Simulate work
-        time.sleep(duration_ms / 1000)
+        await asyncio.sleep(duration_ms / 1000)
 
         # Mark completed
-        try:
-            with SessionLocal() as session:
-                mark_task_completed(session, task_id)
-            logger.info(f"Task {task_id} completed successfully")
-        except Exception as e:
-            logger.error(
-                f"Failed to mark task {task_id} as completed: {e}",
-                exc_info=True,
-                extra={"task_id": task_id}
-            )
-            raise
+        completion_queue.put((task_id, TaskStatus.COMPLETED))
+        logger.info("Task %s completed successfully", task_id)
 
-    except KeyboardInterrupt:
-        logger.warning(f"Task {task_id} interrupted by keyboard")
+    except asyncio.CancelledError:
+        logger.warning("Task %s cancelled", task_id)
         raise
     except Exception as e:
         logger.error(
-            f"Task {task_id} failed during execution: {e}",
+            "Task %s failed during execution: %s",
+            task_id,
+            e,
             exc_info=True,
             extra={"task_id": task_id, "duration_ms": duration_ms}
         )
         # Mark failed on any error
+        completion_queue.put((task_id, TaskStatus.FAILED))
+
+
+def _drain_completions() -> list[tuple[str, str]]:
+    """
+    Block for the next status update, then take whatever else is already
+    queued (up to the batch size) so bursts share one commit.
+    """
+    batch = [completion_queue.get()]
+    while len(batch) < COMPLETION_BATCH_SIZE:
         try:
-            with SessionLocal() as session:
-                mark_task_failed(session, task_id)
-            logger.info(f"Task {task_id} marked as FAILED")
-        except Exception as db_error:
+            batch.append(completion_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def completion_committer_loop(on_commit=None):
+    """
+    Persists worker status updates in batches.
+    Runs in a dedicated thread; `on_commit` is called after each batch.
+    """
+    logger.info("Completion committer started (batch size: %s)", COMPLETION_BATCH_SIZE)
+
+    session = WriteSession()
+    retry_delay = COMMIT_RETRY_BASE_DELAY_S
+
+    while True:
+        batch = _drain_completions()
+        completed_ids = [task_id for task_id, status in batch if status == TaskStatus.COMPLETED]
+        failed_ids = [task_id for task_id, status in batch if status == TaskStatus.FAILED]
+
+        try:
+            mark_tasks_finished(session, completed_ids, failed_ids)
+        except Exception as e:
+            # Requeue rather than drop, or the tasks stay RUNNING and block dependents
+            for update in batch:
+                completion_queue.put(update)
             logger.critical(
-                f"Failed to mark task {task_id} as failed in database: {db_error}",
+                "Failed to persist status for %s task(s), retrying in %.1fs: %s",
+                len(batch),
+                retry_delay,
+                e,
                 exc_info=True,
-                extra={"task_id": task_id}
+                extra={"task_ids": [task_id for task_id, _ in batch]}
             )
+            time.sleep(retry_delay)
+            retry_delay = min(COMMIT_RETRY_MAX_DELAY_S, retry_delay * 2)
+            continue
+
+        retry_delay = COMMIT_RETRY_BASE_DELAY_S
+
+        if on_commit:
+            on_commit()